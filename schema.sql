@@ -3,6 +3,7 @@
 -- Drop existing tables if they exist to allow for clean re-initialization
 DROP TABLE IF EXISTS users;
 DROP TABLE IF EXISTS transactions;
+DROP TABLE IF EXISTS transactions_monthly;
 
 -- 1. Create the Users Table
 CREATE TABLE users (
@@ -17,8 +18,60 @@ CREATE TABLE transactions (
     user_id INTEGER NOT NULL,
     date TEXT NOT NULL,
     amount REAL NOT NULL,
-    type TEXT NOT NULL, 
+    type TEXT NOT NULL,
     category TEXT NOT NULL,
     description TEXT,
     FOREIGN KEY (user_id) REFERENCES users (id)
-);
\ No newline at end of file
+);
+
+-- 3. Pre-aggregated monthly totals per user.
+-- The report reads this tiny table (<= 12 rows per year per user) instead of
+-- grouping the full transaction history on every load. The triggers below
+-- keep it in sync with every change to transactions.
+CREATE TABLE transactions_monthly (
+    user_id INTEGER NOT NULL,
+    month_year TEXT NOT NULL,
+    total_income REAL NOT NULL DEFAULT 0,
+    total_expense REAL NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, month_year)
+);
+
+CREATE TRIGGER trg_tx_monthly_insert AFTER INSERT ON transactions
+BEGIN
+    INSERT INTO transactions_monthly (user_id, month_year, total_income, total_expense)
+    VALUES (
+        NEW.user_id,
+        substr(NEW.date, 1, 7),
+        CASE WHEN NEW.type = 'Income' THEN NEW.amount ELSE 0 END,
+        CASE WHEN NEW.type = 'Expense' THEN NEW.amount ELSE 0 END
+    )
+    ON CONFLICT(user_id, month_year) DO UPDATE SET
+        total_income = total_income + excluded.total_income,
+        total_expense = total_expense + excluded.total_expense;
+END;
+
+CREATE TRIGGER trg_tx_monthly_delete AFTER DELETE ON transactions
+BEGIN
+    UPDATE transactions_monthly SET
+        total_income = total_income - (CASE WHEN OLD.type = 'Income' THEN OLD.amount ELSE 0 END),
+        total_expense = total_expense - (CASE WHEN OLD.type = 'Expense' THEN OLD.amount ELSE 0 END)
+    WHERE user_id = OLD.user_id AND month_year = substr(OLD.date, 1, 7);
+END;
+
+CREATE TRIGGER trg_tx_monthly_update AFTER UPDATE ON transactions
+BEGIN
+    UPDATE transactions_monthly SET
+        total_income = total_income - (CASE WHEN OLD.type = 'Income' THEN OLD.amount ELSE 0 END),
+        total_expense = total_expense - (CASE WHEN OLD.type = 'Expense' THEN OLD.amount ELSE 0 END)
+    WHERE user_id = OLD.user_id AND month_year = substr(OLD.date, 1, 7);
+    INSERT INTO transactions_monthly (user_id, month_year, total_income, total_expense)
+    VALUES (
+        NEW.user_id,
+        substr(NEW.date, 1, 7),
+        CASE WHEN NEW.type = 'Income' THEN NEW.amount ELSE 0 END,
+        CASE WHEN NEW.type = 'Expense' THEN NEW.amount ELSE 0 END
+    )
+    ON CONFLICT(user_id, month_year) DO UPDATE SET
+        total_income = total_income + excluded.total_income,
+        total_expense = total_expense + excluded.total_expense;
+END;
\ No newline at end of file